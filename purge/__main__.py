@@ -21,6 +21,7 @@ from cli import parse_args
 from logger import setup_logger
 from atomic_copy import atomic_copy
 from _purge import purge
+from pack import pack, collect_targets, index_path
 
 
 _logger = None
@@ -73,6 +74,68 @@ def generate_destination(src: pathlib.Path) -> pathlib.Path:
     return dest
 
 
+def pack_and_purge(args) -> None:
+    """pack_and_purge(args)
+    режим упаковки: собирает мелкие файлы по --target,
+    пакует их одним архивом в --pack и очищает каждый
+    исходный файл только после успешной упаковки и только
+    если он не изменился, пока шла упаковка
+    """
+    dest     = args.pack
+    min_size = args.size * args.units
+    max_size = args.limit * args.units
+
+    sources = collect_targets(
+        args.target,
+        min_size=min_size,
+        max_size=max_size,
+        exclude=(dest, index_path(dest)),
+    )
+
+    if not sources:
+        _logger.info('no actions required')
+        sys.exit(0)
+
+    if args.safe and not confirm(
+        f'pack {len(sources)} files into "{dest}" and purge them?'
+    ): user_refuse()
+
+    # Размер и время изменения до упаковки: если после неё они другие,
+    # значит в файл успели дописать, и очистка уничтожит новые строки
+    def _(src: pathlib.Path) -> tuple[int, int]:
+        st = src.stat()
+        return st.st_size, st.st_mtime_ns
+
+    try:
+        before = {src: _(src) for src in sources}
+    except OSError as ose:
+        _logger.error(f'cannot stat sources: {ose}')
+        sys.exit(2)
+
+    if not pack(sources, dest, args.compress):
+        sys.exit(2)
+
+    failed = False
+    for src in sources:
+        try:
+            if _(src) != before[src]:
+                _logger.warning(f'"{src}" changed while packing, not purging it')
+                failed = True
+                continue
+        except OSError as ose:
+            _logger.error(f'cannot stat "{src}": {ose}')
+            failed = True
+            continue
+
+        try:
+            purge(src)
+        except Exception:
+            # Логи уже есть в _purge.purge(), продолжаем с остальными
+            failed = True
+
+    sys.exit(2 if failed else 0)
+
+
 def main() -> None:
     global _logger
 
@@ -85,6 +148,9 @@ def main() -> None:
     )
     _logger = logging.getLogger()
 
+    if args.pack:
+        pack_and_purge(args)
+
     src      = args.target
     min_size = args.size * args.units
 
@@ -38,4 +38,13 @@ UNITS = {
     'MB': 2 ** 20,
     'GB': 2 ** 30 
 }
-DEFAULT_UNIT = 'KB'
\ No newline at end of file
+DEFAULT_UNIT = 'KB'
+
+
+COMPRESSIONS = {
+    'none': 'w',
+    'gz'  : 'w:gz',
+    'bz2' : 'w:bz2',
+    'xz'  : 'w:xz'
+}
+DEFAULT_COMPRESSION = 'none'
@@ -21,6 +21,7 @@ is a module for parsing command line arguments
 import argparse
 import pathlib
 import logging
+import glob
 
 import _meta
 
@@ -35,9 +36,27 @@ def parse_args() -> argparse.Namespace:
     set_condition_group(parser)
     set_destination_group(parser)
     set_logging_group(parser)
+    set_packing_group(parser)
     set_confirmation_group(parser)
 
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    # Директория или glob-шаблон допустимы только при упаковке,
+    # а обычная ротация работает с одним файлом
+    if not args.pack and not args.target.is_file():
+        parser.error(f'file "{args.target}" actually is not a file')
+
+    # Упаковка предназначена только для мелких файлов, поэтому
+    # верхняя граница размера обязательна, а без --pack параметры
+    # упаковки не имеют смысла
+    if args.pack and args.limit is None:
+        parser.error('-L/--limit is required with -p/--pack')
+    if not args.pack and (args.limit is not None or args.compress is not None):
+        parser.error('-z/--compress and -L/--limit require -p/--pack')
+    if args.compress is None:
+        args.compress = _meta.DEFAULT_COMPRESSION
+
+    return args
 
 
 def set_required_group(parser: argparse.ArgumentParser) -> None:
@@ -46,7 +65,8 @@ def set_required_group(parser: argparse.ArgumentParser) -> None:
         '-t', '--target',
         type=existing_target, 
         required=True,
-        help='path to the rotating file'
+        help='path to the rotating file '
+             '(or a directory/glob pattern with --pack)'
     )
     group.add_argument(
         '-s', '--size',
@@ -100,6 +120,25 @@ def set_destination_group(parser: argparse.ArgumentParser) -> None:
         action='store_true',
         help='prohibit copying'
     )
+    group.add_argument(
+        '-p', '--pack',
+        type=pathlib.Path,
+        help='pack all small target files into one tar archive'
+    )
+
+
+def set_packing_group(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group('packing', 'used with --pack')
+    group.add_argument(
+        '-z', '--compress',
+        choices=_meta.COMPRESSIONS,
+        help=f'archive compression (default: {_meta.DEFAULT_COMPRESSION})'
+    )
+    group.add_argument(
+        '-L', '--limit',
+        type=unsigned_int,
+        help='pack only files smaller than this size (required with --pack)'
+    )
 
 
 def set_confirmation_group(parser: argparse.ArgumentParser) -> None:
@@ -145,10 +184,17 @@ def truncate_loglevel(_in: str) -> int:
     return _in
 
 def existing_target(_in: str) -> pathlib.Path:
+    # Существующий путь всегда берётся как есть, даже если в нём
+    # есть "[", "*" или "?". Шаблон проверяется только на наличие
+    # совпадений, а что с ними делать решается уже после разбора
+    if not pathlib.Path(_in).exists() and glob.escape(_in) != _in:
+        if not glob.glob(_in):
+            raise argparse.ArgumentTypeError(f'pattern "{_in}" matches nothing')
+        return pathlib.Path(_in)
     _in = pathlib.Path(_in)
     if not _in.exists():
         raise argparse.ArgumentTypeError(f'file "{_in}" does not exists')
-    if not _in.is_file():
+    if not _in.is_file() and not _in.is_dir():
         raise argparse.ArgumentTypeError(f'file "{_in}" actually is not a file')
     return _in
 
@@ -0,0 +1,356 @@
+# Copyright (C) 2025 AuthorDriu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""pack.py
+packs many small files into one tar archive published with a single
+atomic hard link (which never overwrites an existing file) and keeps a JSON index next to it with the data offset, size,
+mode and mtime of every member. For uncompressed archives the index
+allows to extract a single member with one seek, without scanning
+the whole archive. Compressed archives (gz, bz2, xz) cannot seek, so
+everything before the member still has to be decompressed, though no
+tar headers are parsed
+"""
+
+
+import tempfile
+import tarfile
+import pathlib
+import logging
+import shutil
+import glob
+import json
+import bz2
+import gzip
+import lzma
+import os
+
+from _meta import COMPRESSIONS
+
+
+_logger = logging.getLogger(__file__)
+
+DEFAULT_CHUNK = 1024 * 8
+
+INDEX_SUFFIX = '.index.json'
+
+_OPENERS = {
+    'none': open,
+    'gz'  : gzip.open,
+    'bz2' : bz2.open,
+    'xz'  : lzma.open,
+}
+
+
+def index_path(archive: pathlib.Path) -> pathlib.Path:
+    return archive.with_name(archive.name + INDEX_SUFFIX)
+
+
+def _fsync_dir(directory: pathlib.Path) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def estimate_size(sources: list[pathlib.Path]) -> int:
+    """estimate_size(sources)
+    оценивает размер несжатого tar-архива из sources сверху.
+    На каждый файл приходится заголовок (вместе с PAX-записью
+    до трёх блоков) и данные, выровненные по BLOCKSIZE, а в
+    конце архив дополняется до RECORDSIZE
+    """
+    blocks = 0
+    for src in sources:
+        blocks += 3 + -(-src.stat().st_size // tarfile.BLOCKSIZE)
+    # Два нулевых блока конца архива и дополнение до RECORDSIZE
+    return (blocks + 2) * tarfile.BLOCKSIZE + tarfile.RECORDSIZE
+
+
+def collect_targets(
+        target:   pathlib.Path,
+        min_size: int = 0,
+        max_size: int | None = None,
+        exclude:  tuple[pathlib.Path, ...] = (),
+) -> list[pathlib.Path]:
+    """collect_targets(target, min_size, max_size, exclude)
+    собирает обычные файлы (не симлинки) из директории target
+    (без рекурсии), сам файл target или, если такого пути нет,
+    файлы по glob-шаблону target, размер которых
+    не меньше min_size и строго меньше max_size, если он указан.
+    Пути из exclude пропускаются, чтобы архив не упаковал сам себя,
+    как и архивы с индексами, оставшиеся от прошлых запусков
+    """
+    if target.is_dir():
+        candidates = target.iterdir()
+    elif target.exists():
+        candidates = [target]
+    else:
+        candidates = map(pathlib.Path, glob.glob(str(target)))
+
+    excluded = {p.resolve() for p in exclude}
+    targets  = []
+
+    for path in sorted(candidates):
+        if path.is_symlink() or not path.is_file():
+            continue
+        if path.resolve() in excluded:
+            continue
+
+        # Архивы и индексы прошлых запусков упаковывать и очищать
+        # нельзя: иначе их файлы уже не извлечь
+        if path.name.endswith(INDEX_SUFFIX) or index_path(path).exists():
+            _logger.debug(f'skipping "{path}": it is an archive or an index')
+            continue
+
+        size = path.stat().st_size
+        if size < min_size or (max_size is not None and size >= max_size):
+            _logger.debug(f'skipping "{path}": size {size} is out of bounds')
+            continue
+
+        targets.append(path)
+
+    _logger.debug(f'collected {len(targets)} files to pack')
+    return targets
+
+
+def pack(
+        sources:     list[pathlib.Path],
+        dst:         pathlib.Path,
+        compression: str = 'none',
+        chunk:       int = DEFAULT_CHUNK,
+) -> bool:
+    """pack(sources, dst, compression, chunk)
+    последовательно записывает sources в tar-архив dst
+    (со сжатием compression) через временный файл, который
+    затем атомарно публикуется жёсткой ссылкой dst. Рядом кладётся
+    индекс "<dst>.index.json" со смещением, размером, правами
+    и временем изменения каждого файла. Если dst или индекс уже существуют, то
+    ничего не делает. Сами исходные файлы не трогает
+    """
+    if compression not in COMPRESSIONS:
+        _logger.error(f'unknown compression "{compression}"')
+        return False
+
+    if not sources:
+        _logger.error(f'nothing to pack into "{dst}"')
+        return False
+
+    # Старый архив хранит данные уже очищенных файлов,
+    # поэтому перезаписывать его нельзя
+    for path in (dst, index_path(dst)):
+        if path.exists():
+            _logger.error(f'cannot pack into "{dst}": "{path}" already exists')
+            return False
+
+    success   = True
+    tmp_path  = None
+    tmp_index = None
+
+    # Проверка места на диске: сжатие не учитывается, а мелкие
+    # файлы в tar занимают заметно больше своего размера
+    try:
+        mem_required  = estimate_size(sources)
+        mem_available = shutil.disk_usage(dst.parent).free
+        _logger.debug(f'memory required: {mem_required}, memory available: {mem_available}')
+
+    except OSError as ose:
+        _logger.error(f'cannot check available memory: {ose}')
+        return False
+
+    if mem_available < mem_required:
+        _logger.error(f'not enough memory for packing into "{dst}"')
+        return False
+
+    # Имена внутри архива считаются от общей директории, чтобы
+    # одинаковые имена из разных поддиректорий не конфликтовали
+    root    = pathlib.Path(os.path.commonpath([src.parent.resolve() for src in sources]))
+    members = []
+
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode='wb',
+            suffix='.tmp',
+            dir=dst.parent,
+            delete=False
+        ) as tmpf:
+            tmp_path = pathlib.Path(tmpf.name)
+            _logger.debug(f'created temporary file: "{tmpf.name}"')
+
+            with tarfile.open(fileobj=tmpf, mode=COMPRESSIONS[compression]) as tar:
+                tar.copybufsize = chunk
+
+                for src in sources:
+                    arcname = src.resolve().relative_to(root).as_posix()
+                    info    = tar.gettarinfo(src, arcname=arcname)
+
+                    with open(src, mode='rb') as srcf:
+                        tar.addfile(info, srcf)
+
+                    # tar.offset указывает на конец записанного блока данных,
+                    # а сами данные выровнены по BLOCKSIZE
+                    blocks = -(-info.size // tarfile.BLOCKSIZE)
+                    members.append({
+                        'name'  : arcname,
+                        'offset': tar.offset - blocks * tarfile.BLOCKSIZE,
+                        'size'  : info.size,
+                        'mode'  : info.mode & 0o7777,
+                        'mtime' : info.mtime,
+                    })
+                    _logger.debug(f'packed "{src}" as "{arcname}" ({info.size} bytes)')
+
+            # После упаковки исходники будут очищены, поэтому архив
+            # обязан оказаться на диске до того, как его опубликуем
+            tmpf.flush()
+            os.fsync(tmpf.fileno())
+
+        index = {
+            'archive'    : dst.name,
+            'compression': compression,
+            'members'    : members,
+        }
+        with tempfile.NamedTemporaryFile(
+            mode='w',
+            suffix='.tmp',
+            dir=dst.parent,
+            delete=False
+        ) as tmpf:
+            tmp_index = pathlib.Path(tmpf.name)
+            json.dump(index, tmpf, indent=2)
+            tmpf.flush()
+            os.fsync(tmpf.fileno())
+
+        # Сначала архив, потом индекс: появление индекса означает,
+        # что упаковка полностью завершена. os.link, в отличие от
+        # os.replace, не перезапишет архив, созданный параллельным
+        # запуском после проверки выше. Если индекс положить не
+        # удалось, убираем архив (он точно наш). Временные файлы
+        # удаляются в finally
+        os.link(tmp_path, dst)
+        try:
+            os.link(tmp_index, index_path(dst))
+        except Exception:
+            dst.unlink()
+            raise
+        _fsync_dir(dst.parent)
+
+    except FileExistsError as fee:
+        _logger.error(f'packing into "{dst}" failed: already exists: {fee}')
+        success = False
+
+    except PermissionError as pe:
+        _logger.error(f'packing into "{dst}" failed: permission denied: {pe}')
+        success = False
+
+    except OSError as ose:
+        _logger.error(f'packing into "{dst}" failed: I/O error: {ose}')
+        success = False
+
+    except Exception as e:
+        _logger.error(f'packing into "{dst}" failed: unexpected error: {e}')
+        success = False
+
+    finally:
+
+        for path in (tmp_path, tmp_index):
+            if path and path.exists():
+                try:
+                    path.unlink()
+                    _logger.debug(f'removed temporary file "{path}"')
+                except Exception as e:
+                    _logger.error(f'cannot remove temporary file: {e}')
+
+    if success:
+        _logger.info(f'{len(sources)} files packed into "{dst}"')
+
+    return success
+
+
+def extract_member(
+        archive: pathlib.Path,
+        name:    str,
+        dst:     pathlib.Path,
+        chunk:   int = DEFAULT_CHUNK,
+) -> bool:
+    """extract_member(archive, name, dst, chunk)
+    извлекает из archive файл name в dst, используя индекс:
+    читает ровно size байт со смещения offset, не разбирая
+    заголовки остальных файлов. Для несжатых архивов это
+    обычный seek, для сжатых - распаковка до нужного места.
+    Архив без индекса считается недописанным и не читается
+    """
+    try:
+        index  = json.loads(index_path(archive).read_text())
+        member = next(m for m in index['members'] if m['name'] == name)
+
+    except StopIteration:
+        _logger.error(f'"{name}" not found in "{archive}"')
+        return False
+
+    except (OSError, ValueError, KeyError) as e:
+        _logger.error(f'cannot read index of "{archive}": {e}')
+        return False
+
+    success  = True
+    tmp_path = None
+
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode='wb',
+            suffix='.tmp',
+            dir=dst.parent,
+            delete=False
+        ) as tmpf:
+            tmp_path = pathlib.Path(tmpf.name)
+
+            with _OPENERS[index['compression']](archive, mode='rb') as srcf:
+                srcf.seek(member['offset'])
+                left = member['size']
+                while left > 0:
+                    data = srcf.read(min(chunk, left))
+                    if not data:
+                        raise EOFError(f'unexpected end of "{archive}"')
+                    tmpf.write(data)
+                    left -= len(data)
+
+        os.chmod(tmp_path, member['mode'])
+        os.utime(tmp_path, (member['mtime'], member['mtime']))
+        os.replace(tmp_path, dst)
+
+    except PermissionError as pe:
+        _logger.error(f'extracting "{name}" to "{dst}" failed: permission denied: {pe}')
+        success = False
+
+    except OSError as ose:
+        _logger.error(f'extracting "{name}" to "{dst}" failed: I/O error: {ose}')
+        success = False
+
+    except Exception as e:
+        _logger.error(f'extracting "{name}" to "{dst}" failed: unexpected error: {e}')
+        success = False
+
+    finally:
+
+        if tmp_path and tmp_path.exists():
+            try:
+                tmp_path.unlink()
+                _logger.debug('removed temporary file')
+            except Exception as e:
+                _logger.error(f'cannot remove temporary file: {e}')
+
+    if success:
+        _logger.info(f'"{name}" extracted from "{archive}" to "{dst}"')
+
+    return success